@@ -4,17 +4,20 @@
 
 import streamlit as st
 import hmac
-import pandas as pd
-import random
 import os
 import time
-import base64
 import logging
-import io
+import uuid
 import config
-import sys
-import pkg_resources
-from openai import OpenAI
+import metrics
+import conversation
+from response_cache import ResponseCache
+from tutor_client import TutorClient, QueueFullError
+from term_deck import TermDeck, RATINGS
+from term_bank import open_term_bank
+from transcripts import TranscriptSink
+from prefetch import Prefetcher
+from blob_store import BlobStore
 
 ############################################################################################################
 # Password protection
@@ -45,20 +48,30 @@ def check_password():
 if not check_password():
     st.stop()  # Do not continue if check_password is not True.
 
+# Time the whole rerun; the phases below are timed separately (see metrics.py)
+rerun_start = time.perf_counter()
+
 ############################################################################################################
 # Logging
 
 # logging.basicConfig(level=logging.DEBUG, filename='app_log.log', filemode='w',
 #                     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 
+# Write the timing and token metrics to files every few seconds for Prometheus or other monitoring
+if config.metrics_export_seconds:
+    metrics.start_exporter(config.metrics_export_dir, config.metrics_export_seconds)
+
 ############################################################################################################
 # Streamlit app layout
 
 # Set the page to wide or centered mode
 st.set_page_config(layout="centered")
 
+# import sys
+# from importlib import metadata
+
 # def get_installed_packages():
-#     installed_packages = {pkg.key: pkg.version for pkg in pkg_resources.working_set}
+#     installed_packages = {dist.metadata["Name"].lower(): dist.version for dist in metadata.distributions()}
 #     return installed_packages
 
 # def read_requirements(file_path):
@@ -103,25 +116,56 @@ with st.sidebar:
 
 # Load terms from a CSV file
 # https://discuss.streamlit.io/t/how-to-upload-a-csv-file/7052/2
+# Term banks are shared by every session in the process and keyed by the SHA-256 of the file bytes,
+# so a rerun (or another student using the same file) never re-reads a CSV it has already seen.
+# Each CSV is checked and converted to a memory-mapped Arrow file once (see term_bank.py).
+@st.cache_resource(max_entries=config.term_bank_cache_entries, show_spinner=False)
+def parse_terms(content_hash, _content):
+    return open_term_bank(
+        content_hash,
+        _content,
+        config.term_bank_dir,
+        max_bytes=config.max_terms_file_mb * 1024 * 1024,
+        max_rows=config.max_terms,
+        max_field_chars=config.max_term_field_chars,
+        max_row_errors=config.max_term_row_errors,
+    )
+
+# The bytes of every terms file in use are kept once per process, named by their hash (see blob_store.py).
+# Sessions only keep a reference to their file, so a class uploading the same file shares one copy.
+@st.cache_resource(show_spinner=False)
+def get_blob_store():
+    return BlobStore(max_bytes=config.terms_file_memory_mb * 1024 * 1024)
+
+# The template file only changes on redeploy, so it is read once for each modification time. The cached reference
+# keeps its bytes in the blob store.
+@st.cache_resource(show_spinner=False)
+def read_terms_file(file_path, modified_time):
+    with open(file_path, "rb") as file:
+        return get_blob_store().put(file.read())
+
 def load_terms(file_input):
     try:
         if isinstance(file_input, str):
-            data = pd.read_csv(file_input)
-        else:
-            data = pd.read_csv(io.StringIO(file_input.read().decode('utf-8')))
+            file_input = read_terms_file(file_input, os.path.getmtime(file_input))
+        data = parse_terms(file_input.hash, get_blob_store().get(file_input.hash))
+        st.session_state.terms_hash = file_input.hash
+        if data.skipped_rows or data.duplicates:
+            skipped = "; ".join(f"row {row}: {reason}" for row, reason in data.skipped_rows[:5])
+            st.sidebar.warning(f"{len(data.skipped_rows)} row(s) were skipped ({skipped}) and "
+                               f"{data.duplicates} repeated term(s) were removed from the terms file.")
         return data
     except Exception as e:
         st.error(f"An error occurred while loading the file: {str(e)}")
         logging.exception(f"Error loading file: {e}")
 
-# Function to create a download link for a file
-def create_download_link(file_path, file_name):
+# Function to show a download button for a terms file. The bytes come from the blob store, and Streamlit serves them
+# from its media cache instead of embedding them in the page on every rerun.
+def create_download_button(file_path, file_name):
     try:
-        with open(file_path, "rb") as file:
-            file_content = file.read()
-        encoded_content = base64.b64encode(file_content).decode("utf-8")
-        download_link = f'<a href="data:file/csv;base64,{encoded_content}" download="{file_name}">Download {file_name}</a>'
-        return download_link
+        template = read_terms_file(file_path, os.path.getmtime(file_path))
+        st.sidebar.download_button(f"Download {file_name}", get_blob_store().get(template.hash),
+                                   file_name=file_name, mime="text/csv")
     except FileNotFoundError:
         error_message = f"The file {file_name} was not found."
         st.error(error_message)
@@ -134,43 +178,104 @@ def create_download_link(file_path, file_name):
 # Download link for the template file
 template_file_path = config.default_terms_csv
 
-# File Uploader
+# File Uploader. Each new upload is put in the blob store once and the session keeps only a reference to it,
+# releasing its previous file.
 uploaded_file = st.sidebar.file_uploader(" ", type=["csv"])
-if uploaded_file is not None:
+if uploaded_file is not None and st.session_state.get("uploaded_file_id") != uploaded_file.file_id:
     logging.info(f"File uploaded: {uploaded_file.name}")
-    st.session_state.uploaded_file = uploaded_file
+    previous_terms = st.session_state.get("uploaded_terms")
+    st.session_state.uploaded_file_id = uploaded_file.file_id
+    st.session_state.uploaded_terms = get_blob_store().put(uploaded_file.getvalue())
+    if previous_terms is not None:
+        previous_terms.release()
 
 # Load terms from the file
-if 'uploaded_file' in st.session_state and st.session_state.uploaded_file is not None:
-    terms = load_terms(st.session_state.uploaded_file)
-else:
-    terms = load_terms(template_file_path)
+with metrics.timer("term_loading_seconds"):
+    if st.session_state.get("uploaded_terms") is not None:
+        terms = load_terms(st.session_state.uploaded_terms)
+    else:
+        terms = load_terms(template_file_path)
 
-st.sidebar.markdown(create_download_link(template_file_path, "terms_template.csv"), unsafe_allow_html=True)
+create_download_button(template_file_path, "terms_template.csv")
+
+# Terms file memory for the process, and per session: each session referencing a file shares its bytes
+blob_stats = get_blob_store().stats()
+for name, value in blob_stats.items():
+    metrics.set_gauge(f"terms_files_{name}", value)
+metrics.set_gauge("terms_files_bytes_per_reference", blob_stats["bytes"] / max(blob_stats["references"], 1))
 
 # line break in the sidebar
 st.sidebar.markdown('<hr>', unsafe_allow_html=True)
 
+############################################################################################################
+# Transcripts
+
+# Session transcripts are saved for research by one background writer shared by every session (see transcripts.py)
+@st.cache_resource(show_spinner=False)
+def get_transcript_sink():
+    return TranscriptSink(
+        config.transcripts_path,
+        max_queued=config.transcripts_max_queued,
+        batch_size=config.transcripts_batch_size,
+        flush_seconds=config.transcripts_flush_seconds,
+    )
+
+if "session_id" not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
+
+def record_transcript(event, **fields):
+    if config.transcripts_enabled:
+        get_transcript_sink().record(st.session_state.session_id, event, term=st.session_state.get("selected_term"), **fields)
+
 ############################################################################################################
 # Term Selection and session state
 
-# Function to select a random term and its schema
-def select_random_term_and_schema(terms_df):
-    if not terms_df.empty and 'TERM' in terms_df.columns and 'SCHEMA' in terms_df.columns:
-        #random.seed(counter)
-        selected_row = terms_df.sample()
-        selected_term = selected_row['TERM'].values[0]
-        selected_schema = selected_row['SCHEMA'].values[0]
-        return selected_term, selected_schema
+# Look up a term and build its system prompt, counting its tokens once. This also runs on the prefetch threads,
+# so it must not use st.session_state.
+def prepare_term(term_bank, row, model):
+    term, schema = term_bank.entry(row)
+    message = {"role": "system", "content": config.term_prompt(term, schema)}
+    conversation.message_tokens(message, model)
+    return term, schema, message
+
+# One prefetcher is shared by every session, so the thread pool and the warm-up budget are per process (see prefetch.py)
+@st.cache_resource(show_spinner=False)
+def get_prefetcher():
+    return Prefetcher(warm_requests_per_hour=config.prefetch_warm_requests_per_hour)
+
+# Function to select the next term, its schema and its system prompt from the student's deck (see term_deck.py).
+# If the next term was prefetched and the deck still picks it, the prefetched term and prompt are used.
+def select_random_term_and_schema(term_bank, deck):
+    if term_bank is not None and not term_bank.empty:
+        row = deck.pick()
+        if row is None:
+            return None, None, None
+        st.session_state.pop("next_term_key", None)
+        if config.prefetch_enabled:
+            prepared = get_prefetcher().take(st.session_state.session_id, (st.session_state.terms_hash, row))
+            if prepared is not None:
+                return prepared
+        return prepare_term(term_bank, row, st.session_state["openai_model"])
     else:
-        return None, None
-    
+        return None, None, None
+
+# Each session keeps a deck of row numbers for the current terms file, rebuilt when a different file is loaded
+if terms is not None and st.session_state.get("term_deck_hash") != st.session_state.terms_hash:
+    st.session_state.term_deck = TermDeck(len(terms))
+    st.session_state.term_deck_hash = st.session_state.terms_hash
+
 # Define a basic initial context at the beginning of your script
 initial_context = {
     "role": "system",
     "content": config.initial_prompt
 }
 
+# The tutor instructions are sent first, before the term-specific prompt, once a term has been picked
+tutor_instructions = {
+    "role": "system",
+    "content": config.tutor_instructions
+}
+
 # Initialize the session state variables for selected term, schema, and display messages
 if 'selected_term' not in st.session_state:
     st.session_state.selected_term = None
@@ -185,25 +290,33 @@ if 'selected_term' not in st.session_state:
 if 'display_term' not in st.session_state:
    st.session_state.display_term = False
 
+if "openai_model" not in st.session_state:
+    st.session_state["openai_model"] = config.ai_model
+
 # Toggle term display and select a new term if needed
 if st.button('Click to pick a term'):
-    selected_term, selected_schema = select_random_term_and_schema(terms)
+    selected_term, selected_schema, term_context = select_random_term_and_schema(
+        terms, st.session_state.get("term_deck")
+    )
     st.session_state.selected_term = selected_term
     st.session_state.selected_schema = selected_schema
     st.session_state.display_term = True
 
-    # Update the initial context with dynamic content
-    updated_prompt = config.term_prompt(st.session_state.selected_term, st.session_state.selected_schema)
-    initial_context = {
-        "role": "system", 
-        "content": updated_prompt}
-
     # Reset the conversation with the new initial context
+    if term_context is not None:
+        initial_context = term_context
     st.session_state.display_messages = [initial_context]
+    st.session_state.conversation_summary = conversation.new_summary()
+    record_transcript("term", content=st.session_state.selected_schema)
 
 # Display the term if the condition is met
 if st.session_state.display_term and st.session_state.selected_term:
     st.header(st.session_state.selected_term)
+    # The student's rating decides how soon the term comes back
+    st.caption("How well did you know this term?")
+    for column, rating in zip(st.columns(len(RATINGS)), RATINGS):
+        column.button(rating, on_click=st.session_state.term_deck.rate, args=(rating,),
+                      disabled=st.session_state.term_deck.current_rated, use_container_width=True)
     # Pass the displayed term to the assistant as part of the message
     user_message = f"Define '{st.session_state.selected_term}':"
 elif not st.session_state.selected_term:
@@ -211,16 +324,101 @@ elif not st.session_state.selected_term:
 
 ############################################################################################################
 # ChatGPT
-# Initialize the OpenAI client
-client = OpenAI(api_key=st.secrets["OPENAI_API_KEY"])
+# Initialize the OpenAI client once per process so every session shares its connections and request limits.
+# It is only created once a student sends a message, so the password and term pages never load the OpenAI SDK.
+@st.cache_resource(show_spinner=False)
+def get_client(api_key):
+    return TutorClient(
+        api_key,
+        max_concurrent=config.max_concurrent_requests,
+        max_waiting=config.max_waiting_requests,
+        max_retries=config.max_retries,
+        timeout=config.request_timeout_seconds,
+    )
 
-# Initialize the session state variables if they don't exist
-if "openai_model" not in st.session_state:
-    st.session_state["openai_model"] = config.ai_model
+# Yield the text of each streamed chunk as it arrives, collecting it in `result["chunks"]` so the caller can save the full
+# message, and keeping the token usage sent in the last chunk. The time to the first token is measured from `result["start"]`.
+# Closing the stream in `finally` releases the connection if the response fails or the rerun is cancelled mid-stream.
+def stream_response(stream, result):
+    try:
+        for chunk in stream:
+            if chunk.usage:
+                result["usage"] = chunk.usage
+            if chunk.choices and chunk.choices[0].delta.content:
+                if not result["chunks"]:
+                    metrics.observe("openai_first_token_seconds", time.perf_counter() - result["start"])
+                result["chunks"].append(chunk.choices[0].delta.content)
+                yield chunk.choices[0].delta.content
+    finally:
+        stream.close()
+
+# One response cache is shared by every session in the process
+@st.cache_resource(show_spinner=False)
+def get_response_cache():
+    return ResponseCache(
+        config.response_cache_path,
+        memory_entries=config.response_cache_memory_entries,
+        disk_entries=config.response_cache_disk_entries,
+        ttl_seconds=config.response_cache_ttl_hours * 3600,
+        normalize=config.response_cache_normalize,
+    )
 
+response_cache = get_response_cache()
+
+############################################################################################################
+# Prefetching the next term
+
+# Send the tutor instructions and the next term's prompt with a one-token answer, so OpenAI has the start of the
+# student's first request cached. Only used when config.prefetch_warm_requests_per_hour is above 0, because creating
+# the client loads the OpenAI SDK and every warm-up is a paid request.
+def warm_term(client, model, prepared):
+    response = client.create(
+        model=model,
+        messages=[{"role": m["role"], "content": m["content"]} for m in (tutor_instructions, prepared[2])],
+        max_tokens=1,
+    )
+    metrics.record_usage(response.usage)
+    metrics.increment("prefetch_warm_requests_total")
+
+# While the student works on a term, get the term the deck will pick next ready in the background. A prefetch for a
+# different terms file or deck position is cancelled and replaced. The session state only keeps the key of its
+# prefetch; the prefetch itself is kept by the shared prefetcher.
+if config.prefetch_enabled and terms is not None and st.session_state.display_term and st.session_state.selected_term:
+    next_row = st.session_state.term_deck.peek()
+    next_key = (st.session_state.terms_hash, next_row)
+    if next_row is None:
+        get_prefetcher().cancel(st.session_state.session_id)
+        st.session_state.pop("next_term_key", None)
+    elif st.session_state.get("next_term_key") != next_key:
+        model = st.session_state["openai_model"]
+        warm = None
+        if config.prefetch_warm_requests_per_hour > 0:
+            client = get_client(st.secrets["OPENAI_API_KEY"])
+            warm = lambda prepared: warm_term(client, model, prepared)
+        if get_prefetcher().submit(st.session_state.session_id, next_key,
+                                   lambda: prepare_term(terms, next_row, model), warm):
+            st.session_state.next_term_key = next_key
+    for name, value in get_prefetcher().stats().items():
+        metrics.set_gauge(f"prefetch_{name}", value)
+
+# Initialize the session state variables if they don't exist
 if "display_messages" not in st.session_state:
     st.session_state.display_messages = [initial_context]
 
+if "conversation_summary" not in st.session_state:
+    st.session_state.conversation_summary = conversation.new_summary()
+
+# Fold messages that no longer fit in the prompt into the running summary of the conversation
+def summarize_messages(previous_summary, new_messages):
+    response = client.create(
+        model=st.session_state["openai_model"],
+        messages=conversation.summary_request(previous_summary, new_messages),
+        temperature=0,
+        max_tokens=config.summary_max_tokens,
+    )
+    metrics.record_usage(response.usage)
+    return response.choices[0].message.content
+
 # Get user input
 prompt = st.chat_input("Type your message here...")
 
@@ -230,43 +428,181 @@ if prompt:
     if not st.session_state["display_messages"]:
         st.session_state["display_messages"].append(initial_context)
     st.session_state["display_messages"].append({"role": "user", "content": prompt})
+    record_transcript("message", role="user", content=prompt)
+
+# Earlier messages are shown as one block of markdown, built once for each version of the conversation.
+@st.cache_data(max_entries=1000, show_spinner=False)
+def earlier_messages_markdown(messages):
+    speakers = {"user": "You", "assistant": "Tutor"}
+    return "\n\n---\n\n".join(f"**{speakers.get(role, role)}:** {content}" for role, content in messages)
 
 # Main chat container
 with st.container(height=500, border=True):
-    # Display chat history in reverse order including new messages
-    for message in st.session_state["display_messages"][1:]:
-        if message["role"] == "user":
-            with st.chat_message("user"):
-                st.markdown(message["content"])
-        else:
-            with st.chat_message("assistant"):
-                st.markdown(message["content"])
+    # Display the most recent turns of the chat history, including new messages. Older turns are only sent to the
+    # browser when the student asks for them, so each rerun costs the same however long the conversation gets.
+    with metrics.timer("history_rendering_seconds"):
+        history = st.session_state["display_messages"][1:]
+        # history[-0:] would be the whole history, so split by position to handle history_window_turns = 0
+        split = max(len(history) - 2 * config.history_window_turns, 0)
+        earlier, recent = history[:split], history[split:]
+        if earlier and st.toggle("Show earlier messages", key="show_earlier_messages"):
+            st.markdown(earlier_messages_markdown(tuple((m["role"], m["content"]) for m in earlier)))
+        for message in recent:
+            if message["role"] == "user":
+                with st.chat_message("user"):
+                    st.markdown(message["content"])
+            else:
+                with st.chat_message("assistant"):
+                    st.markdown(message["content"])
 
 # Generate assistant's response and add it to the messages
     if prompt:
-        # Call the OpenAI API without streaming to get a complete response
-        response = client.chat.completions.create(
-            model=st.session_state["openai_model"],
-            messages=[
-                {"role": m["role"], "content": m["content"]}
-                for m in st.session_state["display_messages"]
-            ],
-            stream=False,  # Disable streaming
-            temperature=config.temperature,
-            max_tokens=config.max_tokens,
-            frequency_penalty=config.frequency_penalty,
-            presence_penalty=config.presence_penalty,
-        )
-
-        # Correctly extract the full response from the API's return object.
-        full_response = response.choices[0].message.content
-
-        # Append the full response to the session state for display.
-        st.session_state["display_messages"].append({"role": "assistant", "content": full_response})
-
-        # Directly display the assistant's response in the chat container
-        with st.container():
-            st.chat_message("assistant").write(full_response)
+        import httpx
+        import openai
+        client = get_client(st.secrets["OPENAI_API_KEY"])
+
+        # Tell the student where they are in line while their request waits for a free slot
+        queue_message = st.empty()
+        def show_queue_position(position):
+            queue_message.info(f"Many students are studying right now. You are number {position} in line...")
+
+        # Send the system prompt, the summary of older turns and as many recent turns as fit in the token budget.
+        # Once a term is picked, the tutor instructions (the same for every student and term) go first so that the
+        # provider can cache them, followed by the term, its schema and the conversation.
+        with metrics.timer("prompt_assembly_seconds"):
+            prefix = [tutor_instructions] if st.session_state.selected_term else []
+            context_messages, tokens_saved = conversation.build_context(
+                st.session_state["display_messages"],
+                st.session_state.conversation_summary,
+                budget=config.context_token_budget,
+                min_recent=config.context_min_recent_messages,
+                model=st.session_state["openai_model"],
+                prefix=prefix,
+            )
+            st.session_state.context_tokens_saved = tokens_saved
+            logging.info(f"Context tokens saved by the token budget: {tokens_saved}")
+            metrics.increment("context_tokens_saved_total", tokens_saved)
+
+            request = dict(
+                model=st.session_state["openai_model"],
+                messages=[
+                    {"role": m["role"], "content": m["content"]}
+                    for m in context_messages
+                ],
+                temperature=config.temperature,
+                max_tokens=config.max_tokens,
+                frequency_penalty=config.frequency_penalty,
+                presence_penalty=config.presence_penalty,
+            )
+
+        # Deterministic requests (temperature 0) always get the same answer, so they can be served from the cache
+        cacheable = config.response_cache_enabled and config.temperature == 0
+        cache_key = response_cache.key(request) if cacheable else None
+        cached_response = response_cache.get(cache_key) if cacheable else None
+
+        response_start = time.perf_counter()
+        usage = None
+        if cached_response is not None:
+            st.session_state["display_messages"].append({"role": "assistant", "content": cached_response})
+            st.chat_message("assistant").write(cached_response)
+            metrics.increment("response_cache_hits_total")
+        elif config.stream_responses:
+            # Stream the response so the student starts reading as soon as the first tokens arrive
+            result = {"chunks": [], "usage": None, "start": response_start}
+            try:
+                stream = client.create(on_wait=show_queue_position, **request, stream=True,
+                                       stream_options={"include_usage": True})
+                # The stream holds a request slot until it is closed, even if the rerun stops before it is read.
+                try:
+                    metrics.observe("openai_connect_seconds", time.perf_counter() - result["start"])
+                    queue_message.empty()
+                    with st.chat_message("assistant"):
+                        st.write_stream(stream_response(stream, result))
+                finally:
+                    stream.close()
+                metrics.observe("openai_total_seconds", time.perf_counter() - result["start"])
+                metrics.record_usage(result["usage"])
+                usage = result["usage"]
+                if cacheable:
+                    response_cache.put(cache_key, "".join(result["chunks"]))
+            # Connection drops and read timeouts while streaming come from httpx, not wrapped in an OpenAIError.
+            except (openai.OpenAIError, httpx.HTTPError, QueueFullError) as e:
+                error_message = f"The response was interrupted: {str(e)}"
+                st.error(error_message)
+                logging.exception(error_message)
+                metrics.increment("openai_errors_total")
+            finally:
+                # Keep whatever arrived, even if the stream failed or the student moved on mid-response.
+                full_response = "".join(result["chunks"])
+                if full_response:
+                    st.session_state["display_messages"].append({"role": "assistant", "content": full_response})
+        else:
+            # Call the OpenAI API without streaming to get a complete response
+            try:
+                with metrics.timer("openai_total_seconds"):
+                    response = client.create(on_wait=show_queue_position, **request, stream=False)
+                metrics.record_usage(response.usage)
+                usage = response.usage
+                queue_message.empty()
+
+                # Correctly extract the full response from the API's return object.
+                full_response = response.choices[0].message.content
+                if cacheable:
+                    response_cache.put(cache_key, full_response)
+
+                # Append the full response to the session state for display.
+                st.session_state["display_messages"].append({"role": "assistant", "content": full_response})
+
+                # Directly display the assistant's response in the chat container
+                with st.container():
+                    st.chat_message("assistant").write(full_response)
+            except (openai.OpenAIError, httpx.HTTPError, QueueFullError) as e:
+                queue_message.empty()
+                error_message = f"The response could not be loaded: {str(e)}"
+                st.error(error_message)
+                logging.exception(error_message)
+                metrics.increment("openai_errors_total")
+
+        if st.session_state["display_messages"][-1]["role"] == "assistant":
+            record_transcript(
+                "message",
+                role="assistant",
+                content=st.session_state["display_messages"][-1]["content"],
+                seconds=round(time.perf_counter() - response_start, 3),
+                cached=cached_response is not None,
+                prompt_tokens=usage.prompt_tokens if usage else None,
+                completion_tokens=usage.completion_tokens if usage else None,
+                cached_tokens=metrics.cached_tokens(usage) if usage else None,
+                context_tokens_saved=tokens_saved,
+            )
+        # Now that the student has the response, fold older messages into the summary if the next turn would not fit.
+        # If the summary request fails, those messages are still sent word for word, over the budget if needed.
+        if st.session_state["display_messages"][-1]["role"] == "assistant":
+            try:
+                with metrics.timer("summary_seconds"):
+                    conversation.update_summary(
+                        st.session_state["display_messages"],
+                        st.session_state.conversation_summary,
+                        summarize_messages,
+                        budget=config.context_token_budget,
+                        min_recent=config.context_min_recent_messages,
+                        model=st.session_state["openai_model"],
+                        prefix=prefix,
+                    )
+            except (openai.OpenAIError, httpx.HTTPError, QueueFullError) as e:
+                logging.exception(f"Could not update the conversation summary: {e}")
+                metrics.increment("summary_errors_total")
+
+        if config.transcripts_enabled:
+            for name, value in get_transcript_sink().stats().items():
+                metrics.set_gauge(f"transcripts_{name}", value)
+
+        if cacheable:
+            logging.info(f"Response cache: {response_cache.stats()}")
+            metrics.set_gauge("response_cache_hit_rate", response_cache.stats()["hit_rate"])
+        logging.info(f"OpenAI client: {client.stats()}")
+        for name, value in client.stats().items():
+            metrics.set_gauge(f"openai_client_{name}", value)
 
 st.markdown(config.warning_message, unsafe_allow_html=True)
 
@@ -291,3 +627,5 @@ with st.sidebar:
    # Using the config objects in your Streamlit app
     st.markdown(config.app_creation_message, unsafe_allow_html=True)
     st.markdown(config.app_repo_license_message, unsafe_allow_html=True)
+
+metrics.observe("rerun_seconds", time.perf_counter() - rerun_start)
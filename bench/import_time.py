@@ -0,0 +1,79 @@
+# import_time.py
+
+# Checks how long a fresh Python process takes to import everything app.py imports at the top, which is what a student
+# waits for on a cold container start before the password page appears. It runs the imports with `python -X importtime`,
+# prints the slowest modules, and exits with an error if the total is over --budget-ms or if a module that should be
+# loaded lazily (the OpenAI SDK, pkg_resources, pyarrow) is imported at start-up.
+#
+#   python bench/import_time.py --budget-ms 1000 --json import_time.json
+
+import argparse
+import ast
+import json
+import os
+import subprocess
+import sys
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def startup_imports(script_path):
+    """Returns the import statements at the top level of a script, which run on every cold start."""
+    with open(script_path) as file:
+        tree = ast.parse(file.read())
+    return [ast.unparse(node) for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom))]
+
+def measure(imports, runs=3):
+    """Imports `imports` in fresh processes and returns the fastest run as
+    (total microseconds, {top-level module: cumulative microseconds}, set of every module imported)."""
+    best = None
+    for _ in range(runs):
+        completed = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", "\n".join(imports)],
+            cwd=REPO_DIR, capture_output=True, text=True, check=True,
+        )
+        top_level, imported = {}, set()
+        for line in completed.stderr.splitlines():
+            if not line.startswith("import time:") or "cumulative" in line:
+                continue
+            _, cumulative, name = line[len("import time:"):].split("|")
+            # Nested imports are indented under the module that imported them.
+            name = name[1:]
+            imported.add(name.strip())
+            if not name.startswith(" "):
+                top_level[name] = top_level.get(name, 0) + int(cumulative)
+        total = sum(top_level.values())
+        if best is None or total < best[0]:
+            best = (total, top_level, imported)
+    return best
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure the cold-start import time of app.py.")
+    parser.add_argument("--script", default=os.path.join(REPO_DIR, "app.py"))
+    parser.add_argument("--budget-ms", type=float, default=1000.0, help="fail if the imports take longer than this")
+    parser.add_argument("--forbid", default="openai,httpx,pkg_resources,pyarrow",
+                        help="comma-separated modules that must not be imported at start-up")
+    parser.add_argument("--runs", type=int, default=3, help="take the fastest of this many runs")
+    parser.add_argument("--top", type=int, default=15, help="how many of the slowest modules to print")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    imports = startup_imports(args.script)
+    total_us, modules, imported = measure(imports, args.runs)
+    forbidden = [name for name in args.forbid.split(",") if name and name in imported]
+
+    print(f"Start-up imports of {os.path.basename(args.script)}: {total_us / 1000:.1f} ms (budget {args.budget_ms:.0f} ms)")
+    for us, name in sorted(((us, name) for name, us in modules.items()), reverse=True)[:args.top]:
+        print(f"{us / 1000:>10.1f} ms  {name}")
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump({"total_ms": total_us / 1000, "budget_ms": args.budget_ms, "forbidden": forbidden,
+                       "modules_ms": {name: us / 1000 for name, us in modules.items()}}, file, indent=2)
+
+    failed = False
+    if total_us / 1000 > args.budget_ms:
+        print(f"FAILED start-up imports are over the {args.budget_ms:.0f} ms budget")
+        failed = True
+    for name in forbidden:
+        print(f"FAILED {name} is imported at start-up")
+        failed = True
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,117 @@
+# load_test.py
+
+# Measures how many students the app can serve. It starts the mock OpenAI endpoint (mock_openai.py) and runs many
+# simulated student sessions (simulated_session.py) through the real app.py: enter the password, pick a term, then send
+# several chat messages. No network access or API key is needed, so it can run in CI.
+#
+#   python bench/load_test.py --sessions 50 --concurrency 25 --turns 3
+#
+# Concurrent sessions run in separate worker processes that all share one mock endpoint. It prints reruns per second,
+# p50/p95/p99 latency for each step, memory per session and CPU use, and exits with an error if any session failed
+# or if a step's p95 latency is above --max-p95.
+
+import argparse
+import json
+import multiprocessing
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from mock_openai import MockSettings, start_mock_server
+from simulated_session import run_session, start_worker
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q / 100 * (len(values) - 1))))]
+
+def run_load_test(sessions=20, concurrency=10, turns=3, latency=0.2, tokens_per_second=200.0, error_rate=0.0,
+                  timeout=60.0):
+    """Runs the load test and returns a dictionary of results."""
+    settings = MockSettings(latency, tokens_per_second, error_rate)
+    server, base_url = start_mock_server(settings)
+    cache_path = os.path.join(tempfile.mkdtemp(), "response_cache.sqlite3")
+
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(concurrency, initializer=start_worker, initargs=(base_url, cache_path)) as pool:
+        # Start the workers before the clock so process start-up is not counted as app time.
+        pool.map(time.sleep, [0] * concurrency)
+        start = time.perf_counter()
+        results = pool.starmap(run_session, [(number, turns, timeout) for number in range(sessions)], chunksize=1)
+        wall = time.perf_counter() - start
+    server.shutdown()
+
+    timings = {}
+    for result in results:
+        for name, elapsed in result["timings"]:
+            timings.setdefault(name, []).append(elapsed)
+    reruns = sum(len(result["timings"]) for result in results)
+    # Each worker reports its total CPU time so far; the last report from each worker is its total.
+    cpu = sum({result["pid"]: result["cpu_seconds"] for result in results}.values())
+    state_bytes = [result["state_bytes"] for result in results if result["state_bytes"] is not None]
+
+    return {
+        "sessions": sessions,
+        "concurrency": concurrency,
+        "turns": turns,
+        "wall_seconds": round(wall, 3),
+        "reruns_per_second": round(reruns / wall, 2),
+        "cpu_seconds": round(cpu, 3),
+        "cpu_utilization": round(cpu / wall, 3),
+        "rss_mb_per_session": round(statistics.mean(result["rss_mb"] for result in results), 3),
+        "session_state_kb": round(statistics.mean(state_bytes) / 1024, 2) if state_bytes else 0.0,
+        "mock_requests": settings.requests,
+        "mock_errors": settings.errors,
+        "steps": {
+            name: {
+                "count": len(values),
+                "p50_ms": round(percentile(values, 50) * 1000, 1),
+                "p95_ms": round(percentile(values, 95) * 1000, 1),
+                "p99_ms": round(percentile(values, 99) * 1000, 1),
+            }
+            for name, values in timings.items()
+        },
+        "failures": [result["error"] for result in results if result["error"]],
+    }
+
+def print_report(results):
+    print(f"{results['sessions']} sessions, {results['concurrency']} at a time, {results['turns']} chat turns each")
+    print(f"wall time {results['wall_seconds']} s, {results['reruns_per_second']} reruns/s, "
+          f"CPU {results['cpu_seconds']} s ({results['cpu_utilization']:.0%} of one core)")
+    print(f"RSS growth per session {results['rss_mb_per_session']} MB, "
+          f"session state {results['session_state_kb']} KB")
+    print(f"{'step':<12}{'count':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, step in results["steps"].items():
+        print(f"{name:<12}{step['count']:>8}{step['p50_ms']:>10}{step['p95_ms']:>10}{step['p99_ms']:>10}")
+    for failure in results["failures"]:
+        print(f"FAILED {failure}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test app.py against a local mock OpenAI endpoint.")
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--turns", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.2, help="mock seconds before the first token")
+    parser.add_argument("--tokens-per-second", type=float, default=200.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--timeout", type=float, default=60.0, help="seconds allowed for one rerun")
+    parser.add_argument("--max-p95", type=float, default=None, help="fail if any step's p95 is above this (ms)")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    results = run_load_test(args.sessions, args.concurrency, args.turns, args.latency, args.tokens_per_second,
+                            args.error_rate, args.timeout)
+    print_report(results)
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump(results, file, indent=2)
+
+    slow = [name for name, step in results["steps"].items() if args.max_p95 and step["p95_ms"] > args.max_p95]
+    for name in slow:
+        print(f"FAILED {name} p95 is above {args.max_p95} ms")
+    sys.exit(1 if results["failures"] or slow else 0)
@@ -0,0 +1,127 @@
+# mock_openai.py
+
+# A local stand-in for the OpenAI chat completions endpoint, for load tests and offline development.
+# It answers with a fixed tutor reply after a configurable delay, streams it at a configurable token rate,
+# and can fail a share of requests with rate limit (429) or server (500) errors.
+#
+# Run it on its own:   python bench/mock_openai.py --port 8765 --latency 0.5 --tokens-per-second 50
+# then point the app at it:   OPENAI_BASE_URL=http://127.0.0.1:8765/v1 streamlit run app.py
+
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+REPLY = ("Good start! You described the main idea correctly. Can you think of a real-world example "
+         "that shows this process at work, and explain which part of your definition it illustrates?")
+
+class MockSettings:
+    def __init__(self, latency=0.2, tokens_per_second=200.0, error_rate=0.0, reply=REPLY):
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.error_rate = error_rate
+        self.reply = reply
+        self.requests = 0
+        self.errors = 0
+        self.cached_prefixes = set()
+        self.lock = threading.Lock()
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    settings = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        settings = self.settings
+        with settings.lock:
+            settings.requests += 1
+            failed = random.random() < settings.error_rate
+            if failed:
+                settings.errors += 1
+        time.sleep(settings.latency)
+        if failed:
+            status = random.choice([429, 500])
+            self._send_json(status, {"error": {"message": "Mock error", "type": "mock_error", "code": status}})
+            return
+
+        words = [word + " " for word in settings.reply.split(" ")]
+        messages = body.get("messages", [])
+        prompt_tokens = sum(len(m.get("content", "")) // 4 + 4 for m in messages)
+        # Like the real API, a repeated first message of at least 1024 tokens is cached in steps of 128 tokens.
+        first = messages[0].get("content", "") if messages else ""
+        prefix_tokens = len(first) // 4 + 4
+        with settings.lock:
+            cached = first in settings.cached_prefixes and prefix_tokens >= 1024
+            settings.cached_prefixes.add(first)
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": len(words),
+                 "total_tokens": prompt_tokens + len(words),
+                 "prompt_tokens_details": {"cached_tokens": prefix_tokens // 128 * 128 if cached else 0}}
+        if body.get("stream"):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for word in words:
+                time.sleep(1 / settings.tokens_per_second)
+                self._send_chunk({"choices": [{"index": 0, "delta": {"content": word}, "finish_reason": None}]}, body)
+            self._send_chunk({"choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}, body)
+            if body.get("stream_options", {}).get("include_usage"):
+                self._send_chunk({"choices": [], "usage": usage}, body)
+            self._write_chunk(b"data: [DONE]\n\n")
+            self._write_chunk(b"")
+        else:
+            time.sleep(len(words) / settings.tokens_per_second)
+            self._send_json(200, {
+                "id": "chatcmpl-mock", "object": "chat.completion", "created": int(time.time()),
+                "model": body.get("model", "mock"),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": settings.reply},
+                             "finish_reason": "stop"}],
+                "usage": usage,
+            })
+
+    def _send_json(self, status, payload):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_chunk(self, payload, body):
+        payload = {"id": "chatcmpl-mock", "object": "chat.completion.chunk", "created": int(time.time()),
+                   "model": body.get("model", "mock"), **payload}
+        self._write_chunk(f"data: {json.dumps(payload)}\n\n".encode("utf-8"))
+
+    def _write_chunk(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+def start_mock_server(settings=None, host="127.0.0.1", port=0):
+    """Starts the mock server on a background thread and returns (server, base_url). Port 0 picks a free port."""
+    handler = type("Handler", (MockHandler,), {"settings": settings or MockSettings()})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/v1"
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a local mock of the OpenAI chat completions endpoint.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds before the first token")
+    parser.add_argument("--tokens-per-second", type=float, default=200.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered with 429 or 500")
+    args = parser.parse_args()
+    server, base_url = start_mock_server(
+        MockSettings(args.latency, args.tokens_per_second, args.error_rate), args.host, args.port
+    )
+    print(f"Mock OpenAI endpoint listening at {base_url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
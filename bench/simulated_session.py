@@ -0,0 +1,72 @@
+# simulated_session.py
+
+# One simulated student session for load_test.py: enter the password, pick a term, send several chat messages, then
+# pick the next term, all through the real app.py with Streamlit's AppTest. These functions run in the load test's
+# worker processes, and live in their own module because AppTest replaces __main__ while a script runs.
+
+import os
+import pickle
+import resource
+import sys
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from streamlit.testing.v1 import AppTest
+
+PASSWORD = "load-test"
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS.
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+def current_rss_mb():
+    # The resident set size right now where /proc is available, otherwise the peak so far.
+    try:
+        with open("/proc/self/statm") as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except OSError:
+        return peak_rss_mb()
+
+def start_worker(base_url, cache_path):
+    # AppTest keeps global state and cannot run two sessions at once in one process, so each worker process runs
+    # its sessions one after another and concurrency comes from running several workers.
+    os.environ["OPENAI_BASE_URL"] = base_url
+    os.chdir(REPO_DIR)
+    import config
+    config.response_cache_path = cache_path
+
+def run_session(number, turns, timeout):
+    """Runs one simulated student session and returns its step timings, or the error that stopped it."""
+    timings = []
+    rss_before = current_rss_mb()
+    app = AppTest.from_file(os.path.join(REPO_DIR, "app.py"), default_timeout=timeout)
+    app.secrets["password"] = PASSWORD
+    app.secrets["OPENAI_API_KEY"] = "sk-load-test"
+
+    def step(name, action):
+        start = time.perf_counter()
+        action()
+        timings.append((name, time.perf_counter() - start))
+        if app.exception:
+            raise RuntimeError(app.exception[0].message)
+
+    try:
+        step("load", app.run)
+        step("password", lambda: app.text_input(key="password").input(PASSWORD).run())
+        step("pick_term", lambda: app.button[0].click().run())
+        for turn in range(turns):
+            # Each session writes its own answers so the response cache does not hide the API round trip.
+            message = f"Student {number}, turn {turn}: this is my definition of the term with an example."
+            step("chat_turn", lambda: app.chat_input[0].set_value(message).run())
+        # The next term was prefetched while the session was chatting (see prefetch.py).
+        step("next_term", lambda: app.button[0].click().run())
+        state = {key: app.session_state[key] for key in app.session_state.filtered_state}
+        state_bytes = len(pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL))
+        error = None
+    except Exception as e:
+        state_bytes, error = None, f"session {number}: {e}"
+    return {"timings": timings, "state_bytes": state_bytes, "rss_mb": current_rss_mb() - rss_before,
+            "cpu_seconds": time.process_time(), "pid": os.getpid(), "error": error}
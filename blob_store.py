@@ -0,0 +1,93 @@
+# blob_store.py
+
+# Keeps one copy of each terms file in memory for the whole process, named by the SHA-256 hash of its bytes.
+# When a whole class uploads the same file, every session holds a small reference to the same bytes instead of its
+# own copy. A reference is released when the session lets go of it (or the session ends and its state is freed).
+# Files nobody references are kept for reuse until the store is over its memory limit, then dropped oldest first.
+
+import hashlib
+import threading
+import weakref
+from collections import OrderedDict
+
+class BlobRef:
+    """A reference to one file in a BlobStore. The file is kept while any reference to it is alive."""
+
+    def __init__(self, store, content_hash, size):
+        self.hash = content_hash
+        self.size = size
+        self._release = weakref.finalize(self, store._release, content_hash)
+
+    def release(self):
+        self._release()
+
+class BlobStore:
+    def __init__(self, max_bytes=256 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.deduplicated = 0
+        self.evicted = 0
+        self._lock = threading.Lock()
+        # Hash -> [bytes, reference count], least recently used first.
+        self._blobs = OrderedDict()
+        self._bytes = 0
+
+    def put(self, content):
+        """Stores `content` (unless an identical file is already stored) and returns a new reference to it."""
+        content_hash = hashlib.sha256(content).hexdigest()
+        with self._lock:
+            if content_hash in self._blobs:
+                self.deduplicated += 1
+            else:
+                self._blobs[content_hash] = [bytes(content), 0]
+                self._bytes += len(content)
+            return self._new_ref(content_hash)
+
+    def ref(self, content_hash):
+        """Returns a new reference to a stored file, or None if it is not stored (or was evicted)."""
+        with self._lock:
+            return self._new_ref(content_hash) if content_hash in self._blobs else None
+
+    def get(self, content_hash):
+        """Returns the bytes of a stored file, or None if it is not stored."""
+        with self._lock:
+            blob = self._blobs.get(content_hash)
+            if blob is None:
+                return None
+            self._blobs.move_to_end(content_hash)
+            return blob[0]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "blobs": len(self._blobs),
+                "bytes": self._bytes,
+                "references": sum(blob[1] for blob in self._blobs.values()),
+                "deduplicated": self.deduplicated,
+                "evicted": self.evicted,
+            }
+
+    def _new_ref(self, content_hash):
+        blob = self._blobs[content_hash]
+        blob[1] += 1
+        self._blobs.move_to_end(content_hash)
+        ref = BlobRef(self, content_hash, len(blob[0]))
+        self._evict()
+        return ref
+
+    def _release(self, content_hash):
+        with self._lock:
+            blob = self._blobs.get(content_hash)
+            if blob is not None:
+                blob[1] -= 1
+                self._evict()
+
+    def _evict(self):
+        # Only files nobody references can be dropped, so the store can go over max_bytes while they are all in use.
+        for content_hash in list(self._blobs):
+            if self._bytes <= self.max_bytes:
+                break
+            content, references = self._blobs[content_hash]
+            if references == 0:
+                del self._blobs[content_hash]
+                self._bytes -= len(content)
+                self.evicted += 1
@@ -21,6 +21,72 @@ frequency_penalty = 0.5
 # Presence penalty parameter for the response. Higher penalty will result in less repetitive responses. It varies between 0 and 1.
 presence_penalty = 0.5
 
+# History_window_turns is how many of the latest exchanges (a student message and the AI's reply) are always shown in the chat. Earlier messages are hidden behind a "Show earlier messages" switch, which keeps the app fast during long conversations.
+history_window_turns = 3
+
+# Stream_responses shows the AI's response word by word as it is written instead of waiting for the whole response. Set it to False to show the response all at once.
+stream_responses = True
+
+# Context_token_budget is the most tokens of conversation sent to the AI with each message. Longer conversations are shortened by replacing the oldest messages with a short summary, which keeps long study sessions fast and inexpensive.
+context_token_budget = 3000
+
+# Context_min_recent_messages is how many of the latest messages are always sent word for word, even when they go over the budget.
+context_min_recent_messages = 4
+
+# Summary_max_tokens is the maximum length of the summary of older messages.
+summary_max_tokens = 200
+
+# When temperature is 0 the AI always gives the same response to the same conversation, so responses can be saved and reused.
+# Response_cache_enabled turns this on or off. Saved responses are kept in the response_cache_path file, so they survive app restarts.
+response_cache_enabled = True
+response_cache_path = "response_cache.sqlite3"
+
+# How many saved responses are kept in memory for the fastest reuse, and how many are kept in the file in total.
+response_cache_memory_entries = 256
+response_cache_disk_entries = 10000
+
+# How many hours a saved response can be reused before the AI is asked again.
+response_cache_ttl_hours = 168
+
+# Response_cache_normalize treats student messages that only differ in capital letters or spacing as the same message.
+response_cache_normalize = True
+
+# Max_concurrent_requests is how many requests the app sends to OpenAI at the same time, across all students. Other requests wait in line.
+# Raise it if your OpenAI account has higher rate limits; lower it if students see rate limit errors.
+max_concurrent_requests = 8
+
+# Max_waiting_requests is how many requests can wait in line before new ones are turned away with a "try again" message.
+max_waiting_requests = 200
+
+# If OpenAI is busy (rate limit or server error), a request is retried up to max_retries times, waiting a little longer each time.
+max_retries = 4
+
+# Request_timeout_seconds is how long to wait for OpenAI before giving up on a request.
+request_timeout_seconds = 60
+
+# While a student works on a term, the app gets the next term ready in the background so the next click is instant. Set prefetch_enabled to False to turn this off.
+# Prefetch_warm_requests_per_hour also sends the next term's instructions to OpenAI ahead of time (one very short request each), so OpenAI has them cached when the student answers.
+# These requests cost money, so this is the most the whole app sends in any hour. Set it to 0 to never send them.
+prefetch_enabled = True
+prefetch_warm_requests_per_hour = 0
+
+# The app measures how long each step takes and how many tokens each request uses. Every metrics_export_seconds it writes
+# these to metrics.prom (for Prometheus) and metrics.json in the metrics_export_dir folder. Set it to 0 to turn this off.
+# To see them in the app, add admin_password to your Streamlit secrets and open the Admin metrics page.
+metrics_export_seconds = 60
+metrics_export_dir = "metrics"
+
+# Transcripts_enabled saves each study session (the term, its schema, every message, response times and token use) to the transcripts_path database for research.
+# Only turn it on if your students have been told their conversations are saved and your research protocol allows it.
+transcripts_enabled = False
+transcripts_path = "transcripts.sqlite3"
+
+# Transcripts are saved in the background in batches of up to transcripts_batch_size records, at least every transcripts_flush_seconds.
+# If more than transcripts_max_queued records are waiting, new ones are dropped (and counted on the Admin metrics page) rather than slowing the app down.
+transcripts_batch_size = 200
+transcripts_flush_seconds = 2
+transcripts_max_queued = 10000
+
 # Below is all the text you can customize for the app. Don't remove the quotations around the text. Don't change the variable names.
 
 ############################################################################################################
@@ -29,6 +95,23 @@ presence_penalty = 0.5
 
 default_terms_csv = "terms_template.csv"
 
+# The number of different terms files (the default file plus any uploaded files) the app keeps parsed in memory at once.
+# Students using the same file share one copy. When more files than this are in use, the least recently used one is dropped and re-read when needed.
+term_bank_cache_entries = 32
+
+# Students who upload the same terms file share one copy of it in memory. Terms_file_memory_mb is how much memory the app uses to keep
+# terms files that no student is using right now, in case they are uploaded again. Files in use are always kept.
+terms_file_memory_mb = 256
+
+# Terms files are checked and saved in a fast format in the term_bank_dir folder, so each file is only read once.
+term_bank_dir = "term_banks"
+
+# Limits for terms files. Larger files, or files with more problem rows (such as an empty TERM) than max_term_row_errors, are turned away with a message saying what is wrong.
+max_terms_file_mb = 20
+max_terms = 50000
+max_term_field_chars = 5000
+max_term_row_errors = 20
+
 ############################################################################################################
 
 # Below is all the text you can customize for the app. Don't remove the quotations around the text. Don't change the variable names.
@@ -80,10 +163,15 @@ warning_message = "**ChatGPT can make errors and does not replace verified and r
 # Below is the initial prompt that the AI will use to start the conversation with the user. The user will not see this prompt.
 initial_prompt = "You are an assistant knowledgeable in university-level biology helping a student in a lower division college course. Provide concise and accurate responses to questions or definitions related to biology questions the user asks. The user will be responding to the following instructions set in single quotations: (start of instructions to the user) 'The goal of this app is to help you learn and and assess your knowledge of core course concepts and examples. 1. Click the button below to show a random course term. 2. *Pause and think for 30 seconds.* What is everything you associate with this term? 3. Choose to either answer immediately or dive into your notes or textbook to refresh your memory.4. Write a simple definition of the selected term. Try to include a real-world example and any other associations you might need to know for an exam. 5. Please follow-up with questions. **Have a conversation!**' (end of instructions to the user). Provide formative feedback in a clear, succinct way. Mention any factual errors in the response. Primarily employ the Socratic method, giving the user hints and guiding questions with the goal of getting the user to provide information that was not in the initial user response. While using the socratic method, it is important to help the user identify common misconceptions, especially if they write one in their chat message. You may also include basic metaphors and analogies in your response as long as they are accurate and not misleading or biased heavily toward a native English speaker or American. Do NOT use extraneous language, such as 'your answer lacks a detailed explanation'. Keep in mind that the user's response is limited to 500 characters, so there is no expectation that the correct answer is more than a short paragraph. Try and keep the system's response within 1000 characters. Make sure to always to provide feedback for each part of the user's input. Do not provide advice, such as: 'Remember, the more specific and detailed your response, the better your understanding of the concept will be.' Your secondary goal as the chat progresses is to help users explicitly think about their learning and study process as well as best practices in information and data literacy. If they write anything unrelated to topics reasonably covered in an undergraduate biology course, please respond with: I appreciate your question, but if you would like to take a break from studying, might I suggest a tall glass of water and mindful relaxation."
 
-# Below is the follow-up prompt that the AI will use once the user has typed a message. The user will not see this prompt.
+# Below are the instructions the AI follows once a term has been picked. The user will not see them.
+# They are the same for every student and every term and are sent first, so OpenAI can cache them and respond faster and more cheaply.
+# OpenAI only caches prompts that start with at least 1024 identical tokens (roughly 4000 characters), so longer instructions are cached for every student and term.
+tutor_instructions = """You are an assistant knowledgeable in university-level biology helping a student in a lower division college course. Provide concise and accurate responses to questions or definitions related to the selected term, which is given in the next message together with how the course uses it. The user will be responding to the following instructions set in single quotations:(start of instructions to the user) 'The goal of this app is to help you learn and and assess your knowledge of core course concepts and examples. 1. Click the button below to show a random course term. 2. *Pause and think for 30 seconds.* What is everything you associate with this term? 3. Choose to either answer immediately or dive into your notes or textbook to refresh your memory.4. Write a simple definition of the selected term. Try to include a real-world example and any other associations you might need to know for an exam. 5. Please follow-up with questions. **Have a conversation!**' (end of instructions to the user). Provide formative feedback in a clear, succinct way. Use the course context given for the selected term to guide your response. However, do not provide users with all of this definition information immediately. Mention any factual errors in the response. Primarily employ the Socratic method, giving the user hints and guiding questions with the goal of getting the user to provide information that was not in the initial user response. While using the socratic method, it is important to help the user identify common misconceptions, especially if they write one in their chat message. Make your responses short, with each response ending with a single guiding question. Do not ask the user additional questions in your response. If their response is incomplete, please provide enough detail so that they know exactly how to make their response accurate. Your goal is to stimulate conversation with the user and help them understand the term. Try not to provide them with comprehensive information all at once. You may also include basic metaphors and analogies in your response as long as they are accurate and not misleading or biased heavily toward a native English speaker or American.However, DO NOT sacrifice technical accuracy of a response to simpler diction. If asked to define something, please provide the technical definition. Do NOT use extraneous language, such as 'your answer lacks a detailed explanation'. Keep in mind that my response is limited to 500 characters, so there is no expectation that the correct answer is more than a short paragraph. Try and keep your response within 1000 characters. Make sure to always to provide feedback for each part of the users input. Do not provide advice, such as: 'Remember, the more specific and detailed your response, the better your understanding of the concept will be.' Your secondary goal as the chat progresses is to help users explicitly think about their learning and study process as well as best practices in information and data literacy. If they write anything unrelated to topics possibly covered in an undergraduate biology course, please respond with: I appreciate your question, but if you would like to take a break from studying, might I suggest a tall glass of water and mindful relaxation."""
+
+# Below is the term-specific prompt that is sent after the instructions above. The user will not see this prompt.
 # DO NOT REMOVE/EDIT anything outside of the triple quotations or anything inside the curly braces
 def term_prompt(selected_term, selected_schema):
-    return f"""You are an assistant knowledgeable in university-level biology helping a student in a lower division college course. Provide concise and accurate responses to questions or definitions related to the term '{selected_term}'. The user will be responding to the following instructions set in single quotations:(start of instructions to the user) 'The goal of this app is to help you learn and and assess your knowledge of core course concepts and examples. 1. Click the button below to show a random course term. 2. *Pause and think for 30 seconds.* What is everything you associate with this term? 3. Choose to either answer immediately or dive into your notes or textbook to refresh your memory.4. Write a simple definition of the selected term. Try to include a real-world example and any other associations you might need to know for an exam. 5. Please follow-up with questions. **Have a conversation!**' (end of instructions to the user). Provide formative feedback in a clear, succinct way. Use the following to provide context for how the course uses the selected term: '{selected_schema}'. However, do not provide users with all of this definition information immediately. Rather use it to guide your response. Mention any factual errors in the response. Primarily employ the Socratic method, giving the user hints and guiding questions with the goal of getting the user to provide information that was not in the initial user response. While using the socratic method, it is important to help the user identify common misconceptions, especially if they write one in their chat message. Make your responses short, with each response ending with a single guiding question. Do not ask the user additional questions in your response. If their response is incomplete, please provide enough detail so that they know exactly how to make their response accurate. Your goal is to stimulate conversation with the user and help them understand the term. Try not to provide them with comprehensive information all at once. You may also include basic metaphors and analogies in your response as long as they are accurate and not misleading or biased heavily toward a native English speaker or American.However, DO NOT sacrifice technical accuracy of a response to simpler diction. If asked to define something, please provide the technical definition. Do NOT use extraneous language, such as 'your answer lacks a detailed explanation'. Keep in mind that my response is limited to 500 characters, so there is no expectation that the correct answer is more than a short paragraph. Try and keep your response within 1000 characters. Make sure to always to provide feedback for each part of the users input. Do not provide advice, such as: 'Remember, the more specific and detailed your response, the better your understanding of the concept will be.' Your secondary goal as the chat progresses is to help users explicitly think about their learning and study process as well as best practices in information and data literacy. If they write anything unrelated to topics possibly covered in an undergraduate biology course, please respond with: I appreciate your question, but if you would like to take a break from studying, might I suggest a tall glass of water and mindful relaxation."""
+    return f"""The selected term is '{selected_term}'. Use the following to provide context for how the course uses the selected term: '{selected_schema}'. However, do not provide users with all of this definition information immediately. Rather use it to guide your response."""
 
 ############################################################################################################
 
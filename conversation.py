@@ -0,0 +1,113 @@
+# conversation.py
+
+# Keeps the prompt sent to the AI within a token budget. The system prompt and the most recent messages are always sent.
+# After each response, if the next turn would go over the budget, older messages are folded into a short running
+# summary a batch at a time, so building the prompt never waits on an extra AI request. Until a message is in the
+# summary, it is sent word for word.
+
+try:
+    import tiktoken
+except ImportError:  # tiktoken is optional; without it tokens are estimated from the text length.
+    tiktoken = None
+
+# Every chat message costs a few tokens of formatting on top of its content.
+MESSAGE_OVERHEAD_TOKENS = 4
+
+SUMMARY_PROMPT = "You keep notes on a tutoring conversation between a biology student and an AI tutor. Update the notes with the new messages. Keep what the student got right, their misconceptions, and the question that is still open. Reply with the updated notes only, in under 150 words."
+
+_encodings = {}
+
+def count_tokens(text, model=None):
+    """Returns the number of tokens in `text`, or an estimate of about four characters per token without tiktoken."""
+    if tiktoken is None:
+        return len(text) // 4 + 1
+    if model not in _encodings:
+        try:
+            _encodings[model] = tiktoken.encoding_for_model(model)
+        except KeyError:
+            _encodings[model] = tiktoken.get_encoding("cl100k_base")
+    return len(_encodings[model].encode(text))
+
+def message_tokens(message, model=None):
+    """Returns the token count of a chat message, remembering it on the message so it is only counted once."""
+    if "tokens" not in message:
+        message["tokens"] = count_tokens(message["content"], model) + MESSAGE_OVERHEAD_TOKENS
+    return message["tokens"]
+
+def new_summary():
+    """Returns an empty running summary: the summary text, how many history messages it already covers, and the tokens
+    spent on summary requests that have not yet been made up for by shorter prompts."""
+    return {"text": "", "messages": 0, "cost": 0}
+
+def _summary_message(summary):
+    return {"role": "system", "content": f"Summary of the earlier conversation: {summary['text']}"}
+
+def _recent_count(recent, available, min_recent, model):
+    """Returns how many of the newest `recent` messages fit in `available` tokens, and never fewer than `min_recent`."""
+    keep = 0
+    for message in reversed(recent):
+        if keep >= min_recent and message_tokens(message, model) > available:
+            break
+        available -= message_tokens(message, model)
+        keep += 1
+    return keep
+
+def _available(messages, summary, budget, model, prefix):
+    fixed = list(prefix) + messages[:1] + ([_summary_message(summary)] if summary["text"] else [])
+    return budget - sum(message_tokens(m, model) for m in fixed)
+
+def build_context(messages, summary, budget, min_recent, model=None, prefix=()):
+    """Returns the messages to send for `messages`, and how many tokens the summary saved.
+
+    `messages[0]` is the system prompt. `prefix` messages are always sent first and never change, so the provider can
+    cache them. After the summary, every message it does not cover yet is sent word for word, so no message is ever
+    left out of both. `update_summary` keeps this within `budget`. This never calls the AI, so it does not delay the
+    response.
+    """
+    prefix = list(prefix)
+    system, history = messages[0], messages[1:]
+    full_tokens = sum(message_tokens(m, model) for m in prefix + messages)
+    if not summary["messages"]:
+        return prefix + [system] + history, 0
+
+    context = prefix + [system, _summary_message(summary)] + history[summary["messages"]:]
+    saved = max(full_tokens - sum(message_tokens(m, model) for m in context), 0)
+    # Savings first make up for the tokens spent on summary requests.
+    paid_back = min(saved, summary["cost"])
+    summary["cost"] -= paid_back
+    return context, saved - paid_back
+
+def update_summary(messages, summary, summarize, budget, min_recent, model=None, prefix=()):
+    """Folds older messages into `summary` if the next turn would not fit in the budget. Call it after the response
+    is shown.
+
+    The next turn is assumed to be as long as the last exchange (the last two messages). When it would not fit, enough
+    older messages are folded in to free half of the budget for recent messages, so the AI is only asked for a summary
+    every few turns. The newest `min_recent` messages are never folded in. `summarize(previous_text, new_messages)`
+    returns the new summary text; if it raises, the summary is left as it was and the messages are still sent word for
+    word.
+    """
+    history = messages[1:]
+    recent = history[summary["messages"]:]
+    # The summary message is sent from the first fold on, so make room for it before there is any text.
+    available = _available(messages, {**summary, "text": summary["text"] or "-"}, budget, model, prefix)
+    next_turn = sum(message_tokens(m, model) for m in history[-2:])
+    if sum(message_tokens(m, model) for m in recent) + next_turn <= available:
+        return
+    keep = _recent_count(recent, available // 2, min_recent, model)
+    dropped = recent[:len(recent) - keep]
+    if not dropped:
+        return
+    text = summarize(summary["text"], dropped)
+    request_tokens = sum(message_tokens(m, model) for m in summary_request(summary["text"], dropped))
+    summary["cost"] += request_tokens + count_tokens(text, model)
+    summary["text"] = text
+    summary["messages"] += len(dropped)
+
+def summary_request(previous_text, new_messages):
+    """Returns the messages asking the AI to fold `new_messages` into the notes in `previous_text`."""
+    transcript = "\n".join(f"{m['role']}: {m['content']}" for m in new_messages)
+    return [
+        {"role": "system", "content": SUMMARY_PROMPT},
+        {"role": "user", "content": f"Notes so far:\n{previous_text or '(none)'}\n\nNew messages:\n{transcript}"},
+    ]
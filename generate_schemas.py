@@ -0,0 +1,141 @@
+# generate_schemas.py
+
+# Fills in the SCHEMA column of a terms CSV file (like course_terms_no_schema.csv) with the AI, many terms at a time.
+#
+#   OPENAI_API_KEY=sk-... python generate_schemas.py course_terms_no_schema.csv my_terms.csv
+#
+# Each finished schema is saved to a checkpoint file (the output file name plus .checkpoint.jsonl) as soon as it
+# arrives, so if the script is stopped, running the same command again only asks for the terms that are still missing.
+# Failed terms are retried; the output file is only written once, complete, so it is never left half-written.
+# Use --base-url to point the script at another endpoint, such as bench/mock_openai.py for testing.
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+
+import pandas as pd
+
+import config
+
+SCHEMA_PROMPT = """You are helping a university biology instructor write study notes for the course term '{term}'. Write the notes on one line in exactly this format, with each part separated by a semicolon: Definition: (one or two plain sentences); Characteristics: (the key features a student should know); Examples: (one or two real-world examples); Related Terms: (a comma-separated list); Important Scientists: (a comma-separated list, if any). Keep it accurate, use simple language and stay under 1200 characters. Reply with the notes only."""
+
+class RateLimiter:
+    """Lets at most `per_minute` requests start in any minute, spread evenly."""
+
+    def __init__(self, per_minute):
+        self.interval = 60.0 / per_minute if per_minute else 0.0
+        self.next_start = 0.0
+        self.lock = asyncio.Lock()
+
+    async def wait(self):
+        async with self.lock:
+            now = time.monotonic()
+            delay = self.next_start - now
+            self.next_start = max(now, self.next_start) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+def load_checkpoint(path):
+    """Returns the schemas already generated, by row number."""
+    done = {}
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as file:
+            for line in file:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # A line cut off when the script was stopped.
+                done[record["row"]] = record["schema"]
+    return done
+
+async def generate_schema(client, term, args):
+    response = await client.chat.completions.create(
+        model=args.model,
+        messages=[{"role": "user", "content": SCHEMA_PROMPT.format(term=term)}],
+        temperature=config.temperature,
+        max_tokens=args.max_tokens,
+    )
+    return " ".join(response.choices[0].message.content.split())
+
+async def fill_row(row, term, client, limiter, slots, checkpoint, args):
+    """Generates the schema for one row, retrying with backoff, and returns it (or None if every attempt failed)."""
+    import openai
+
+    for attempt in range(args.retries + 1):
+        await limiter.wait()
+        try:
+            async with slots:
+                schema = await generate_schema(client, term, args)
+            checkpoint.write(json.dumps({"row": row, "schema": schema}) + "\n")
+            checkpoint.flush()
+            print(f"done    row {row + 2}: {term}")
+            return schema
+        except openai.OpenAIError as e:
+            if attempt == args.retries:
+                print(f"FAILED  row {row + 2}: {term}: {e}", file=sys.stderr)
+                return None
+            await asyncio.sleep(random.uniform(0, min(30.0, 2.0 ** attempt)))
+
+async def fill_schemas(args):
+    from openai import AsyncOpenAI
+
+    terms = pd.read_csv(args.input, dtype=str, keep_default_na=False)
+    for column in ("TERM", "SCHEMA"):
+        if column not in terms.columns:
+            terms[column] = ""
+
+    checkpoint_path = args.output + ".checkpoint.jsonl"
+    done = load_checkpoint(checkpoint_path)
+    todo = [
+        (row, term) for row, (term, schema) in enumerate(zip(terms["TERM"], terms["SCHEMA"]))
+        if term.strip() and row not in done and (args.overwrite or not schema.strip())
+    ]
+    print(f"{len(todo)} schema(s) to generate, {len(done)} already in the checkpoint")
+
+    client = AsyncOpenAI(api_key=args.api_key, base_url=args.base_url, max_retries=0, timeout=args.timeout)
+    limiter = RateLimiter(args.requests_per_minute)
+    slots = asyncio.Semaphore(args.concurrency)
+    with open(checkpoint_path, "a", encoding="utf-8") as checkpoint:
+        results = await asyncio.gather(
+            *(fill_row(row, term, client, limiter, slots, checkpoint, args) for row, term in todo)
+        )
+    await client.close()
+
+    done.update({row: schema for (row, _), schema in zip(todo, results) if schema is not None})
+    for row, schema in done.items():
+        terms.at[row, "SCHEMA"] = schema
+
+    # Write the whole file next to the output and rename it, so the output is never half-written.
+    temporary_path = args.output + ".tmp"
+    terms.to_csv(temporary_path, index=False)
+    os.replace(temporary_path, args.output)
+
+    failed = results.count(None)
+    print(f"Wrote {args.output}: {len(todo) - failed} generated, {failed} failed")
+    if failed:
+        print("Run the same command again to retry the failed terms.", file=sys.stderr)
+    else:
+        os.remove(checkpoint_path)
+    return failed
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fill in the SCHEMA column of a terms CSV file with the AI.")
+    parser.add_argument("input", help="terms CSV file with a TERM column")
+    parser.add_argument("output", help="where to write the CSV file with schemas")
+    parser.add_argument("--model", default=config.ai_model)
+    parser.add_argument("--max-tokens", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=8, help="requests sent at the same time")
+    parser.add_argument("--requests-per-minute", type=float, default=120, help="0 for no limit")
+    parser.add_argument("--retries", type=int, default=4, help="retries for each failed term")
+    parser.add_argument("--timeout", type=float, default=60.0, help="seconds to wait for each response")
+    parser.add_argument("--overwrite", action="store_true", help="also replace schemas that are already filled in")
+    parser.add_argument("--api-key", default=os.environ.get("OPENAI_API_KEY"))
+    parser.add_argument("--base-url", default=os.environ.get("OPENAI_BASE_URL"))
+    args = parser.parse_args()
+    if not args.api_key:
+        parser.error("set OPENAI_API_KEY or pass --api-key")
+    sys.exit(1 if asyncio.run(fill_schemas(args)) else 0)
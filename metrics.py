@@ -0,0 +1,163 @@
+# metrics.py
+
+# Timing and token-usage measurements for the app, shared by every session in the process.
+# Each measurement goes into a histogram with fixed buckets (for Prometheus) and a window of the most recent values
+# (for p50/p95/p99 on the metrics page). Everything can be written to a Prometheus text file and a JSON file.
+
+import json
+import logging
+import math
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# Bucket upper bounds for timings (seconds) and token counts.
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+TOKEN_BUCKETS = (50, 100, 250, 500, 1000, 2000, 4000, 8000, 16000)
+
+# How many recent values each histogram keeps for its percentiles.
+WINDOW_SIZE = 1000
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.bucket_counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.recent = deque(maxlen=WINDOW_SIZE)
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        self.recent.append(value)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.bucket_counts[i] += 1
+                break
+        else:
+            self.bucket_counts[-1] += 1
+
+    def percentile(self, q):
+        if not self.recent:
+            return 0.0
+        values = sorted(self.recent)
+        return values[min(len(values) - 1, int(math.ceil(q / 100 * len(values))) - 1)]
+
+_lock = threading.Lock()
+_histograms = {}
+_counters = {}
+_gauges = {}
+_exporter = None
+
+def observe(name, value, buckets=SECONDS_BUCKETS):
+    """Records one value in the histogram `name`."""
+    with _lock:
+        if name not in _histograms:
+            _histograms[name] = Histogram(buckets)
+        _histograms[name].observe(value)
+
+def increment(name, amount=1):
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + amount
+
+def set_gauge(name, value):
+    with _lock:
+        _gauges[name] = value
+
+@contextmanager
+def timer(name):
+    """Times the body of a `with` block and records it, in seconds, in the histogram `name`."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start)
+
+def cached_tokens(usage):
+    """Returns how many prompt tokens the provider served from its prompt cache, from an OpenAI `usage` object."""
+    details = getattr(usage, "prompt_tokens_details", None)
+    if isinstance(details, dict):
+        return details.get("cached_tokens") or 0
+    return getattr(details, "cached_tokens", None) or 0
+
+def record_usage(usage):
+    """Records the prompt, cached prompt and completion token counts from an OpenAI `usage` object, if there is one."""
+    if usage is None:
+        return
+    observe("openai_prompt_tokens", usage.prompt_tokens, TOKEN_BUCKETS)
+    observe("openai_completion_tokens", usage.completion_tokens, TOKEN_BUCKETS)
+    observe("openai_cached_prompt_tokens", cached_tokens(usage), TOKEN_BUCKETS)
+    increment("openai_prompt_tokens_total", usage.prompt_tokens)
+    increment("openai_completion_tokens_total", usage.completion_tokens)
+    increment("openai_cached_prompt_tokens_total", cached_tokens(usage))
+    with _lock:
+        prompt_total = _counters["openai_prompt_tokens_total"]
+        _gauges["openai_prompt_cache_hit_rate"] = _counters["openai_cached_prompt_tokens_total"] / prompt_total if prompt_total else 0.0
+
+def snapshot():
+    """Returns every measurement as a dictionary: histogram summaries, counters and gauges."""
+    with _lock:
+        return {
+            "time": time.time(),
+            "histograms": {
+                name: {
+                    "count": h.count,
+                    "sum": h.sum,
+                    "p50": h.percentile(50),
+                    "p95": h.percentile(95),
+                    "p99": h.percentile(99),
+                }
+                for name, h in sorted(_histograms.items())
+            },
+            "counters": dict(sorted(_counters.items())),
+            "gauges": dict(sorted(_gauges.items())),
+        }
+
+def prometheus_text():
+    """Returns every measurement in the Prometheus text exposition format."""
+    lines = []
+    with _lock:
+        for name, h in sorted(_histograms.items()):
+            lines.append(f"# TYPE saber_{name} histogram")
+            cumulative = 0
+            for bound, count in zip(h.buckets, h.bucket_counts):
+                cumulative += count
+                lines.append(f'saber_{name}_bucket{{le="{bound}"}} {cumulative}')
+            lines.append(f'saber_{name}_bucket{{le="+Inf"}} {h.count}')
+            lines.append(f"saber_{name}_sum {h.sum}")
+            lines.append(f"saber_{name}_count {h.count}")
+        for name, value in sorted(_counters.items()):
+            lines.append(f"# TYPE saber_{name} counter")
+            lines.append(f"saber_{name} {value}")
+        for name, value in sorted(_gauges.items()):
+            lines.append(f"# TYPE saber_{name} gauge")
+            lines.append(f"saber_{name} {value}")
+    return "\n".join(lines) + "\n"
+
+def export(directory):
+    """Writes metrics.prom and metrics.json to `directory`, replacing the previous files in one step."""
+    os.makedirs(directory, exist_ok=True)
+    for file_name, content in (("metrics.prom", prometheus_text()), ("metrics.json", json.dumps(snapshot(), indent=2))):
+        path = os.path.join(directory, file_name)
+        with open(path + ".tmp", "w") as file:
+            file.write(content)
+        os.replace(path + ".tmp", path)
+
+def start_exporter(directory, interval_seconds):
+    """Starts a background thread that exports the metrics every `interval_seconds`. Only the first call starts one."""
+    global _exporter
+    with _lock:
+        if _exporter is not None:
+            return
+        _exporter = threading.Thread(target=_export_forever, args=(directory, interval_seconds), daemon=True)
+    _exporter.start()
+
+def _export_forever(directory, interval_seconds):
+    while True:
+        time.sleep(interval_seconds)
+        try:
+            export(directory)
+        except OSError:
+            logging.exception("Could not export metrics")
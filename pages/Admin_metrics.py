@@ -0,0 +1,60 @@
+############################################################################################################
+# Admin metrics page: timing and token-usage measurements for the whole app (see metrics.py).
+# Only shown after entering the admin_password from your Streamlit secrets.
+
+import streamlit as st
+import hmac
+import pandas as pd
+import metrics
+
+############################################################################################################
+# Password protection
+
+def check_admin_password():
+    """Returns `True` if the user had the correct admin password."""
+
+    def admin_password_entered():
+        """Checks whether the admin password entered by the user is correct."""
+        if hmac.compare_digest(st.session_state["admin_password"], st.secrets.get("admin_password", "")) \
+                and st.secrets.get("admin_password"):
+            st.session_state["admin_password_correct"] = True
+            del st.session_state["admin_password"]  # Don't store the password.
+        else:
+            st.session_state["admin_password_correct"] = False
+
+    if st.session_state.get("admin_password_correct", False):
+        return True
+
+    st.text_input(
+        "Admin password", type="password", on_change=admin_password_entered, key="admin_password"
+    )
+    if "admin_password_correct" in st.session_state:
+        st.error("😕 Password incorrect")
+    return False
+
+if not check_admin_password():
+    st.stop()
+
+############################################################################################################
+# Metrics
+
+st.title("App metrics")
+st.caption("Measurements since this app process started. Percentiles are over the most recent requests.")
+if st.button("Refresh"):
+    st.rerun()
+
+snapshot = metrics.snapshot()
+
+st.subheader("Timings (seconds) and tokens per request")
+if snapshot["histograms"]:
+    st.dataframe(pd.DataFrame.from_dict(snapshot["histograms"], orient="index"), use_container_width=True)
+else:
+    st.write("Nothing has been measured yet.")
+
+st.subheader("Totals and current values")
+st.dataframe(
+    pd.Series({**snapshot["counters"], **snapshot["gauges"]}, name="value", dtype="float64"),
+    use_container_width=True,
+)
+
+st.download_button("Download in Prometheus format", metrics.prometheus_text(), file_name="metrics.prom")
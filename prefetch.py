@@ -0,0 +1,131 @@
+# prefetch.py
+
+# Gets the next term ready while the student is still working on the current one, so picking a term is instant.
+# The work runs on a small thread pool shared by every session. Each session has at most one prefetch, kept here by
+# session id so the session state only holds plain values. A prefetch that is no longer needed (a different terms
+# file was loaded, or the deck picked a different term) is cancelled; if it has not started yet it never runs.
+# Optional warm-up requests to OpenAI run on their own threads and are limited by a per-process budget, so prefetching
+# cannot run up the bill or hold up preparing the next term.
+
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+class Prefetch:
+    """One speculative job for `key`. `cancelled` is set when its result is no longer wanted."""
+
+    def __init__(self, key):
+        self.key = key
+        self.cancelled = threading.Event()
+        self.future = None
+
+class Prefetcher:
+    def __init__(self, max_workers=2, max_pending=50, max_sessions=1000, warm_requests_per_hour=0, warm_workers=2):
+        self.max_pending = max_pending
+        self.max_sessions = max_sessions
+        self.warm_requests_per_hour = warm_requests_per_hour
+        self._executor = ThreadPoolExecutor(max_workers, thread_name_prefix="prefetch")
+        self._warm_executor = ThreadPoolExecutor(warm_workers, thread_name_prefix="prefetch-warm")
+        self._lock = threading.Lock()
+        # Session id -> that session's Prefetch, least recently submitted first.
+        self._prefetches = OrderedDict()
+        self._pending = 0
+        self._warm_times = deque()
+        self._counts = {"submitted": 0, "used": 0, "cancelled": 0, "skipped": 0, "warmed": 0, "warm_denied": 0}
+
+    def submit(self, session, key, prepare, warm=None):
+        """Runs `prepare()` on the pool for `session`, then `warm(result)` if given and the warm-up budget allows it.
+
+        Any other prefetch for the session is cancelled. Returns False if too many prefetches are already waiting.
+        """
+        self.cancel(session)
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self._counts["skipped"] += 1
+                return False
+            self._pending += 1
+            self._counts["submitted"] += 1
+        prefetch = Prefetch(key)
+        prefetch.future = self._executor.submit(self._run, prefetch, prepare, warm)
+        prefetch.future.add_done_callback(self._finished)
+        with self._lock:
+            self._prefetches[session] = prefetch
+            # Sessions that ended without picking a term leave their prefetch behind; drop the oldest ones.
+            while len(self._prefetches) > self.max_sessions:
+                self._cancel(self._prefetches.popitem(last=False)[1])
+        return True
+
+    def take(self, session, key):
+        """Returns the session's prepared result if it was prepared for `key` and is ready.
+
+        Otherwise the prefetch is cancelled and None is returned, so the caller prepares the result itself without
+        waiting on the pool.
+        """
+        with self._lock:
+            prefetch = self._prefetches.pop(session, None)
+        if prefetch is None:
+            return None
+        if prefetch.key == key and prefetch.future.done() and not prefetch.future.cancelled():
+            try:
+                result = prefetch.future.result()
+                self._count("used")
+                return result
+            except Exception:
+                logging.exception(f"Prefetch for {prefetch.key} failed")
+        with self._lock:
+            self._cancel(prefetch)
+        return None
+
+    def cancel(self, session):
+        with self._lock:
+            prefetch = self._prefetches.pop(session, None)
+            if prefetch is not None:
+                self._cancel(prefetch)
+
+    def stats(self):
+        with self._lock:
+            return {"pending": self._pending, "sessions": len(self._prefetches), **self._counts}
+
+    def _cancel(self, prefetch):
+        if not prefetch.cancelled.is_set():
+            prefetch.cancelled.set()
+            prefetch.future.cancel()
+            self._counts["cancelled"] += 1
+
+    def _run(self, prefetch, prepare, warm):
+        result = prepare()
+        if warm is not None and not prefetch.cancelled.is_set() and self._take_warm_budget():
+            # Warm-ups can wait a long time for a request slot, so they never share threads with `prepare`.
+            self._warm_executor.submit(self._warm, prefetch, warm, result)
+        return result
+
+    def _warm(self, prefetch, warm, result):
+        if prefetch.cancelled.is_set():
+            return
+        try:
+            warm(result)
+        except Exception:
+            logging.exception(f"Prefetch warm-up for {prefetch.key} failed")
+
+    def _take_warm_budget(self):
+        """Uses one warm-up request from the budget for the last hour. Returns False if it is used up."""
+        now = time.monotonic()
+        with self._lock:
+            while self._warm_times and now - self._warm_times[0] >= 3600:
+                self._warm_times.popleft()
+            if len(self._warm_times) >= self.warm_requests_per_hour:
+                self._counts["warm_denied"] += 1
+                return False
+            self._warm_times.append(now)
+            self._counts["warmed"] += 1
+            return True
+
+    def _finished(self, future):
+        with self._lock:
+            self._pending -= 1
+
+    def _count(self, name):
+        with self._lock:
+            self._counts[name] += 1
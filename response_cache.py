@@ -0,0 +1,103 @@
+# response_cache.py
+
+# Caches AI responses for requests that will always get the same answer (temperature 0), so a repeated request is
+# answered in milliseconds instead of waiting on (and paying for) another API call.
+# Recently used responses are kept in memory; all responses are also stored in a SQLite file that survives restarts.
+
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+def normalize_text(text):
+    """Lowercases text and collapses runs of whitespace, so trivially different answers share a cache entry."""
+    return re.sub(r"\s+", " ", text).strip().lower()
+
+def request_key(request, normalize=False):
+    """Returns a stable hash of the full request: model, sampling parameters and every message."""
+    request = dict(request)
+    if normalize:
+        request["messages"] = [
+            {**m, "content": normalize_text(m["content"])} if m["role"] == "user" else m
+            for m in request["messages"]
+        ]
+    canonical = json.dumps(request, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+class ResponseCache:
+    """A two-tier (memory, then SQLite) response cache with a time-to-live and a maximum number of entries."""
+
+    def __init__(self, path, memory_entries=256, disk_entries=10000, ttl_seconds=7 * 24 * 3600, normalize=False):
+        self.memory_entries = memory_entries
+        self.disk_entries = disk_entries
+        self.ttl_seconds = ttl_seconds
+        self.normalize = normalize
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        with self._db:
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, response TEXT NOT NULL, created REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS responses_created ON responses (created)")
+
+    def key(self, request):
+        return request_key(request, self.normalize)
+
+    def get(self, key):
+        """Returns the cached response for `key`, or None if there is no fresh entry."""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and now - entry[1] < self.ttl_seconds:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            row = self._db.execute(
+                "SELECT response, created FROM responses WHERE key = ? AND created > ?", (key, now - self.ttl_seconds)
+            ).fetchone()
+            if row is None:
+                self._memory.pop(key, None)
+                self.misses += 1
+                return None
+            self._remember(key, row[0], row[1])
+            self.hits += 1
+            self.disk_hits += 1
+            return row[0]
+
+    def put(self, key, response):
+        now = time.time()
+        with self._lock:
+            self._remember(key, response, now)
+            with self._db:
+                self._db.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?)", (key, response, now))
+                # Drop expired entries and, beyond the size limit, the oldest ones.
+                self._db.execute("DELETE FROM responses WHERE created <= ?", (now - self.ttl_seconds,))
+                self._db.execute(
+                    "DELETE FROM responses WHERE key IN "
+                    "(SELECT key FROM responses ORDER BY created DESC LIMIT -1 OFFSET ?)",
+                    (self.disk_entries,),
+                )
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "memory_entries": len(self._memory),
+            }
+
+    def _remember(self, key, response, created):
+        self._memory[key] = (response, created)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
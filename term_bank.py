@@ -0,0 +1,129 @@
+# term_bank.py
+
+# Reads a terms CSV file into a term bank. The file is read in chunks of rows, so problems are found while reading:
+# a file that is too large, is missing the TERM or SCHEMA column, or has too many bad rows is rejected before the
+# rest of it is read. Rows with an empty TERM or an overly long field are skipped, and repeated terms are kept once.
+#
+# Accepted banks are saved as Arrow files named by the hash of the CSV. Arrow files are memory-mapped when opened,
+# so a bank opens in about the same time however many terms it has, and every session reads the same memory.
+# Rejected files are remembered the same way, so the same bad upload is not read again on every rerun.
+# pandas and pyarrow take a few hundred milliseconds to import, so they are only imported when a bank is opened.
+
+import io
+import json
+import os
+
+class TermBankError(ValueError):
+    """Raised when a terms file cannot be used. The message says which rows are wrong."""
+
+class TermBank:
+    """Terms and schemas by row number, read straight from a (usually memory-mapped) Arrow table."""
+
+    def __init__(self, table):
+        self._terms = table.column("TERM")
+        self._schemas = table.column("SCHEMA")
+        metadata = table.schema.metadata or {}
+        # Rows that were skipped while reading the CSV, as (CSV row number, reason), and how many repeats were dropped.
+        self.skipped_rows = json.loads(metadata.get(b"skipped_rows", b"[]"))
+        self.duplicates = int(metadata.get(b"duplicates", b"0"))
+
+    def __len__(self):
+        return len(self._terms)
+
+    @property
+    def empty(self):
+        return len(self) == 0
+
+    def entry(self, row):
+        """Returns the (term, schema) in row number `row`."""
+        return self._terms[row].as_py(), self._schemas[row].as_py()
+
+def read_csv_in_chunks(content, chunk_rows=1000, max_rows=50000, max_field_chars=5000, max_row_errors=20):
+    """Reads and checks a terms CSV chunk by chunk and returns an Arrow table of the accepted rows."""
+    import pandas as pd
+    import pyarrow as pa
+
+    terms, schemas, seen, skipped = [], [], set(), []
+    duplicates = 0
+    # CSV row numbers count the header as row 1.
+    row_number = 1
+    try:
+        # index_col=False keeps rows with extra fields from turning the first column into the index.
+        reader = pd.read_csv(io.BytesIO(content), chunksize=chunk_rows, dtype=str, keep_default_na=False,
+                             encoding="utf-8", index_col=False)
+        for chunk in reader:
+            missing = [column for column in ("TERM", "SCHEMA") if column not in chunk.columns]
+            if missing:
+                raise TermBankError(f"The terms file is missing the column(s): {', '.join(missing)}")
+            for term, schema in zip(chunk["TERM"], chunk["SCHEMA"]):
+                row_number += 1
+                term, schema = term.strip(), schema.strip()
+                if not term:
+                    skipped.append((row_number, "TERM is empty"))
+                elif len(term) > max_field_chars or len(schema) > max_field_chars:
+                    skipped.append((row_number, f"TERM or SCHEMA is longer than {max_field_chars} characters"))
+                elif term.lower() in seen:
+                    duplicates += 1
+                else:
+                    seen.add(term.lower())
+                    terms.append(term)
+                    schemas.append(schema)
+            if len(skipped) > max_row_errors:
+                details = "; ".join(f"row {row}: {reason}" for row, reason in skipped[:5])
+                raise TermBankError(f"The terms file has too many problem rows ({details}; ...)")
+            if len(terms) > max_rows:
+                raise TermBankError(f"The terms file has more than {max_rows} terms.")
+    except (pd.errors.ParserError, UnicodeDecodeError) as e:
+        raise TermBankError(f"The terms file is not a valid UTF-8 CSV file: {e}") from e
+    except pd.errors.EmptyDataError as e:
+        raise TermBankError("The terms file is empty.") from e
+
+    metadata = {"skipped_rows": json.dumps(skipped), "duplicates": str(duplicates)}
+    return pa.table({"TERM": pa.array(terms, pa.string()), "SCHEMA": pa.array(schemas, pa.string())},
+                    metadata=metadata)
+
+def _write_atomically(path, write):
+    # Write to a temporary file and rename it, so another session never opens a half-written file.
+    temporary_path = f"{path}.{os.getpid()}.tmp"
+    write(temporary_path)
+    os.replace(temporary_path, path)
+
+def _write_rejection(path, rejection):
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(rejection, file)
+
+def open_term_bank(content_hash, content, directory, max_bytes=20 * 1024 * 1024, **limits):
+    """Returns the term bank for a CSV file's bytes, converting it to an Arrow file in `directory` the first time.
+
+    Raises TermBankError if the file cannot be used. The reason is saved next to where the Arrow file would be and
+    reused while the limits stay the same.
+    """
+    import pyarrow as pa
+
+    path = os.path.join(directory, f"{content_hash}.arrow")
+    rejected_path = os.path.join(directory, f"{content_hash}.rejected.json")
+    if not os.path.exists(path):
+        checked_limits = {"max_bytes": max_bytes, **limits}
+        if os.path.exists(rejected_path):
+            with open(rejected_path, encoding="utf-8") as file:
+                rejection = json.load(file)
+            if rejection["limits"] == checked_limits:
+                raise TermBankError(rejection["message"])
+        try:
+            if len(content) > max_bytes:
+                raise TermBankError(f"The terms file is larger than {max_bytes // (1024 * 1024)} MB.")
+            table = read_csv_in_chunks(content, **limits)
+        except TermBankError as e:
+            os.makedirs(directory, exist_ok=True)
+            rejection = {"limits": checked_limits, "message": str(e)}
+            _write_atomically(rejected_path, lambda temporary_path: _write_rejection(temporary_path, rejection))
+            raise
+        os.makedirs(directory, exist_ok=True)
+
+        def write_arrow(temporary_path):
+            with pa.OSFile(temporary_path, "wb") as sink:
+                with pa.ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table.combine_chunks())
+
+        _write_atomically(path, write_arrow)
+    return TermBank(pa.ipc.open_file(pa.memory_map(path, "r")).read_all())
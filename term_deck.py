@@ -0,0 +1,86 @@
+# term_deck.py
+
+# Decides which term a student sees next. Terms the student has not seen yet come from a shuffled array of row numbers;
+# terms they have rated are kept in a heap ordered by when they are due again (spaced repetition), so a term the student
+# found hard comes back sooner than one they found easy. Picking and rating a term are O(log n), and each session only
+# stores row numbers, never a copy of the terms table.
+
+import heapq
+import random
+import time
+from array import array
+
+# Seconds until a term rated for the first time is due again, and how each rating changes its ease.
+RATINGS = {
+    "Again": {"first_interval": 60, "ease_change": -0.2},
+    "Hard": {"first_interval": 5 * 60, "ease_change": -0.15},
+    "Good": {"first_interval": 10 * 60, "ease_change": 0.0},
+    "Easy": {"first_interval": 24 * 3600, "ease_change": 0.15},
+}
+
+MIN_EASE = 1.3
+START_EASE = 2.5
+
+class TermDeck:
+    def __init__(self, term_count, seed=None):
+        rng = random.Random(seed)
+        # Row numbers of unseen terms, in random order; `_next_unseen` is the next one to show.
+        self._unseen = array("I", range(term_count))
+        for i in range(term_count - 1, 0, -1):
+            j = rng.randint(0, i)
+            self._unseen[i], self._unseen[j] = self._unseen[j], self._unseen[i]
+        self._next_unseen = 0
+        # Heap of (due time, row number) for rated terms, and each rated term's (interval, ease).
+        self._due = []
+        self._schedule = {}
+        self.current = None
+        self.current_rated = True
+
+    def __len__(self):
+        return len(self._unseen)
+
+    def pick(self, now=None):
+        """Returns the row number of the next term: the most overdue rated term, otherwise an unseen one."""
+        now = time.time() if now is None else now
+        if not self.current_rated:
+            self.rate("Good", now)
+        row = self.peek(now)
+        if row is None:
+            return None
+        if self._due and self._due[0][1] == row:
+            heapq.heappop(self._due)
+        else:
+            self._next_unseen += 1
+        self.current = row
+        self.current_rated = False
+        return row
+
+    def peek(self, now=None):
+        """Returns the row number `pick` would return at `now`, without picking it.
+
+        An unrated current term is not scheduled yet, so it is left out; the answer can change once time passes.
+        """
+        now = time.time() if now is None else now
+        if self._due and (self._due[0][0] <= now or self._next_unseen >= len(self._unseen)):
+            return self._due[0][1]
+        if self._next_unseen < len(self._unseen):
+            return self._unseen[self._next_unseen]
+        return None
+
+    def rate(self, rating, now=None):
+        """Schedules the current term according to how well the student knew it ("Again", "Hard", "Good" or "Easy")."""
+        if self.current is None or self.current_rated:
+            return
+        now = time.time() if now is None else now
+        change = RATINGS[rating]
+        interval, ease = self._schedule.get(self.current, (None, START_EASE))
+        ease = max(MIN_EASE, ease + change["ease_change"])
+        if interval is None or rating == "Again":
+            interval = change["first_interval"]
+        elif rating == "Hard":
+            interval = interval * 1.2
+        else:
+            interval = interval * ease * (1.3 if rating == "Easy" else 1.0)
+        self._schedule[self.current] = (interval, ease)
+        heapq.heappush(self._due, (now + interval, self.current))
+        self.current_rated = True
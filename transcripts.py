@@ -0,0 +1,91 @@
+# transcripts.py
+
+# Saves study-session transcripts (the term, its schema, every message, timings and token usage) for research,
+# without slowing the app down. The app only puts records on an in-memory queue; a background thread writes them to
+# a SQLite database in batches. If the queue is full, a record waits briefly and is then dropped and counted.
+
+import atexit
+import json
+import logging
+import queue
+import sqlite3
+import threading
+import time
+
+class TranscriptSink:
+    def __init__(self, path, max_queued=10000, batch_size=200, flush_seconds=2.0, put_timeout=0.05):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.put_timeout = put_timeout
+        self.written = 0
+        self.dropped = 0
+        self._lock = threading.Lock()
+        self._queue = queue.Queue(maxsize=max_queued)
+        self._stopped = threading.Event()
+        self._writer = threading.Thread(target=self._write_forever, name="transcript-writer", daemon=True)
+        self._writer.start()
+        atexit.register(self.close)
+
+    def record(self, session, event, term=None, role=None, content=None, **data):
+        """Queues one transcript record. Returns False if it was dropped because the queue stayed full."""
+        record = (time.time(), session, event, term, role, content, json.dumps(data) if data else None)
+        try:
+            self._queue.put(record, timeout=self.put_timeout)
+            return True
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            return False
+
+    def stats(self):
+        with self._lock:
+            return {"queued": self._queue.qsize(), "written": self.written, "dropped": self.dropped}
+
+    def close(self, timeout=5.0):
+        """Writes everything still queued and stops the writer thread."""
+        self._stopped.set()
+        self._writer.join(timeout)
+
+    def _write_forever(self):
+        db = sqlite3.connect(self.path)
+        # WAL lets researchers read the database while the app keeps writing to it.
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        with db:
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS transcript (id INTEGER PRIMARY KEY, time REAL NOT NULL, session TEXT NOT NULL, "
+                "event TEXT NOT NULL, term TEXT, role TEXT, content TEXT, data TEXT)"
+            )
+        while not (self._stopped.is_set() and self._queue.empty()):
+            # Collect records until the batch is full or flush_seconds have passed since the first one.
+            batch = []
+            deadline = None
+            while len(batch) < self.batch_size:
+                timeout = 0.5 if deadline is None else deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=timeout))
+                except queue.Empty:
+                    if deadline is None and self._stopped.is_set():
+                        break
+                    continue
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_seconds
+            if not batch:
+                continue
+            try:
+                with db:
+                    db.executemany(
+                        "INSERT INTO transcript (time, session, event, term, role, content, data) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        batch,
+                    )
+                with self._lock:
+                    self.written += len(batch)
+            except sqlite3.Error:
+                with self._lock:
+                    self.dropped += len(batch)
+                logging.exception(f"Could not write {len(batch)} transcript records")
+        db.close()
@@ -0,0 +1,150 @@
+# tutor_client.py
+
+# One OpenAI client shared by every session in the process. It reuses HTTP connections, limits how many requests
+# are sent to the API at once, queues the rest in order, and retries rate-limit (429) and server (5xx) errors
+# with exponential backoff and jitter.
+# The OpenAI SDK takes about half a second to import, so it is only imported when the first client is created.
+
+import random
+import threading
+import time
+import weakref
+from collections import deque
+
+class QueueFullError(Exception):
+    """Raised when too many requests are already waiting for the API."""
+
+class TutorClient:
+    def __init__(self, api_key, max_concurrent=8, max_waiting=200, max_retries=4, timeout=60.0,
+                 backoff_seconds=1.0, max_backoff_seconds=30.0):
+        import httpx
+        from openai import OpenAI
+
+        self.max_concurrent = max_concurrent
+        self.max_waiting = max_waiting
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        http_client = httpx.Client(
+            limits=httpx.Limits(max_connections=max_concurrent, max_keepalive_connections=max_concurrent),
+            timeout=timeout,
+        )
+        # Retries are done here rather than in the SDK so that they can be counted.
+        self.openai = OpenAI(api_key=api_key, http_client=http_client, max_retries=0, timeout=timeout)
+        self._condition = threading.Condition()
+        self._waiting = deque()
+        self._active = 0
+        self.requests = 0
+        self.retries = 0
+        self.rejected = 0
+
+    def create(self, on_wait=None, **request):
+        """Sends a chat completion request once a slot is free and returns the response (or stream).
+
+        `on_wait(position)` is called while the request is waiting in line. A stream keeps its slot until it is closed.
+        """
+        self._acquire(on_wait)
+        try:
+            response = self._create_with_retries(request)
+        except BaseException:
+            self._release()
+            raise
+        if request.get("stream"):
+            return _SlotStream(response, self._release)
+        self._release()
+        return response
+
+    def stats(self):
+        with self._condition:
+            return {
+                "active": self._active,
+                "queue_depth": len(self._waiting),
+                "requests": self.requests,
+                "retries": self.retries,
+                "rejected": self.rejected,
+            }
+
+    def _create_with_retries(self, request):
+        import openai
+
+        # Errors worth retrying: rate limits, server errors, timeouts and dropped connections.
+        retryable_errors = (openai.RateLimitError, openai.InternalServerError, openai.APIConnectionError)
+        for attempt in range(self.max_retries + 1):
+            try:
+                return self.openai.chat.completions.create(**request)
+            except retryable_errors as e:
+                if attempt == self.max_retries:
+                    raise
+                with self._condition:
+                    self.retries += 1
+                time.sleep(self._backoff(attempt, e))
+
+    def _backoff(self, attempt, error):
+        # Honour the server's Retry-After header when it sends one, otherwise use full-jitter exponential backoff.
+        response = getattr(error, "response", None)
+        retry_after = response.headers.get("retry-after") if response is not None else None
+        if retry_after:
+            try:
+                return min(float(retry_after), self.max_backoff_seconds)
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.max_backoff_seconds, self.backoff_seconds * 2 ** attempt))
+
+    def _acquire(self, on_wait):
+        ticket = object()
+        with self._condition:
+            self.requests += 1
+            if self._active >= self.max_concurrent and len(self._waiting) >= self.max_waiting:
+                self.rejected += 1
+                raise QueueFullError("Too many students are waiting for the tutor right now. Please try again in a minute.")
+            self._waiting.append(ticket)
+        reported = None
+        try:
+            while True:
+                with self._condition:
+                    if self._waiting[0] is ticket and self._active < self.max_concurrent:
+                        self._active += 1
+                        return
+                    position = self._waiting.index(ticket) + 1
+                # Call back without the lock: on_wait updates the page, which can be slow or raise to stop the rerun.
+                if on_wait is not None and position != reported:
+                    on_wait(position)
+                    reported = position
+                with self._condition:
+                    if self._waiting[0] is not ticket or self._active >= self.max_concurrent:
+                        self._condition.wait(timeout=1.0)
+        finally:
+            with self._condition:
+                self._waiting.remove(ticket)
+                self._condition.notify_all()
+
+    def _release(self):
+        with self._condition:
+            self._active -= 1
+            self._condition.notify_all()
+
+def _close_stream(stream, release):
+    try:
+        stream.close()
+    finally:
+        release()
+
+class _SlotStream:
+    """Wraps a response stream and frees its concurrency slot exactly once when the stream is closed or finished.
+
+    If the stream is dropped without being closed (the rerun stopped before it was read), the slot is freed when the
+    stream is garbage collected.
+    """
+
+    def __init__(self, stream, release):
+        self._stream = stream
+        self._close = weakref.finalize(self, _close_stream, stream, release)
+
+    def __iter__(self):
+        try:
+            yield from self._stream
+        finally:
+            self.close()
+
+    def close(self):
+        self._close()